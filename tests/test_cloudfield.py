@@ -0,0 +1,252 @@
+import pytest
+from pytest import approx
+
+import numpy as np
+import numpy.testing as npt
+import pandas as pd
+
+from solarspatialtools import cloudfield
+
+
+@pytest.fixture
+def random_field():
+    # Weights concentrated at the coarse scales keep the field smooth enough
+    # that the cloud edges stay a small fraction of the test domain
+    weights = np.array([1, 3], dtype=float)
+    weights /= np.sum(weights)
+    return cloudfield.stacked_field(weights, (64, 128), scales=[4, 5],
+                                    rng=np.random.default_rng(42))
+
+
+class TestRandomAtScale:
+    def test_shapes(self):
+        random, random_new = cloudfield._random_at_scale(
+            (4, 8), (16, 32), rng=np.random.default_rng(42))
+        assert random.shape == (4, 8)
+        assert random_new.shape == (16, 32)
+
+    def test_range(self):
+        _, random_new = cloudfield._random_at_scale(
+            (4, 8), (16, 32), rng=np.random.default_rng(42))
+        assert np.all(random_new >= 0)
+        assert np.all(random_new <= 1)
+
+    def test_identity(self):
+        # Equal sizes should reproduce the coarse field exactly
+        random, random_new = cloudfield._random_at_scale(
+            (8, 8), (8, 8), rng=np.random.default_rng(42))
+        npt.assert_allclose(random, random_new)
+
+    def test_reproducible(self):
+        # Equal seeds should reproduce the same field
+        _, first = cloudfield._random_at_scale(
+            (4, 8), (16, 32), rng=np.random.default_rng(42))
+        _, second = cloudfield._random_at_scale(
+            (4, 8), (16, 32), rng=np.random.default_rng(42))
+        npt.assert_array_equal(first, second)
+
+    def test_matches_scipy(self):
+        # The closed-form bilinear upsample should agree with scipy's
+        # general regular grid interpolator
+        from scipy.interpolate import RegularGridInterpolator
+        random, random_new = cloudfield._random_at_scale(
+            (5, 7), (20, 30), rng=np.random.default_rng(42))
+
+        x = np.arange(5)
+        y = np.arange(7)
+        interp = RegularGridInterpolator((x, y), random)
+        xnew = np.linspace(0, 4, 20)
+        ynew = np.linspace(0, 6, 30)
+        xx, yy = np.meshgrid(xnew, ynew, indexing='ij')
+        expected = interp((xx, yy))
+
+        # single precision field, so compare at float32 resolution
+        npt.assert_allclose(random_new, expected, atol=1e-6)
+
+
+class TestStackedField:
+    def test_shape(self, random_field):
+        assert random_field.shape == (64, 128)
+
+    def test_dtype(self, random_field):
+        assert random_field.dtype == np.float32
+
+    def test_normalization(self, random_field):
+        assert np.min(random_field) == approx(0, abs=1e-6)
+        assert np.max(random_field) == approx(1, abs=1e-6)
+
+    def test_length_mismatch(self):
+        with pytest.raises(ValueError):
+            cloudfield.stacked_field([0.5, 0.5], (32, 32), scales=[1, 2, 3])
+
+    def test_numba_matches_numpy(self, monkeypatch):
+        # The fused numba kernel should agree with the pure numpy path
+        pytest.importorskip('numba')
+        weights = np.array([0.25, 0.75])
+        fast = cloudfield.stacked_field(weights, (32, 64), scales=[3, 4],
+                                        rng=np.random.default_rng(42))
+        monkeypatch.setattr(cloudfield, '_HAS_NUMBA', False)
+        slow = cloudfield.stacked_field(weights, (32, 64), scales=[3, 4],
+                                        rng=np.random.default_rng(42))
+        npt.assert_allclose(fast, slow, atol=1e-5)
+
+    def test_gpu_requires_cupy(self):
+        if cloudfield._HAS_CUPY:
+            pytest.skip('cupy is installed')
+        with pytest.raises(ImportError):
+            cloudfield.stacked_field(np.array([1.0]), (8, 8), gpu=True)
+
+
+class TestQuantile:
+    def test_scalar(self):
+        np.random.seed(42)
+        data = np.random.rand(10000)
+        assert cloudfield._quantile(data, 0.5) == \
+            approx(np.quantile(data, 0.5), abs=1e-3)
+
+    def test_multiple(self):
+        np.random.seed(42)
+        data = np.random.rand(10000)
+        lo, hi = cloudfield._quantile(data, [0.1, 0.9])
+        assert lo == approx(np.quantile(data, 0.1), abs=1e-3)
+        assert hi == approx(np.quantile(data, 0.9), abs=1e-3)
+
+    def test_extremes(self):
+        data = np.arange(100, dtype=float)
+        assert cloudfield._quantile(data, 0) == 0
+        assert cloudfield._quantile(data, 1) == 99
+
+
+class TestClipField:
+    def test_fraction(self, random_field):
+        mask = cloudfield._clip_field(random_field, clear_frac=0.5)
+        assert np.mean(mask) == approx(0.5, abs=0.05)
+
+    def test_binary(self, random_field):
+        mask = cloudfield._clip_field(random_field, clear_frac=0.3)
+        assert set(np.unique(mask)) <= {0, 1}
+
+
+class TestBoxSat:
+    def test_matches_uniform_filter(self):
+        # Away from the borders the SAT box mean matches uniform_filter
+        from scipy.ndimage import uniform_filter
+        np.random.seed(42)
+        a = np.random.rand(32, 48)
+        out = cloudfield._box_sat(a, 5)
+        expected = uniform_filter(a, size=5)
+        npt.assert_allclose(out[2:-2, 2:-2], expected[2:-2, 2:-2],
+                            rtol=1e-10)
+
+
+class TestFindEdges:
+    def test_no_edges(self):
+        mask = np.zeros((32, 32))
+        edges, smoothed = cloudfield._find_edges(mask, 3)
+        assert np.all(edges == 0)
+        assert not np.any(smoothed)
+
+    def test_square(self):
+        mask = np.zeros((32, 32))
+        mask[8:24, 8:24] = 1
+        edges, smoothed = cloudfield._find_edges(mask, 3)
+        # Edges exist and the smoothed region contains them
+        assert np.any(edges > 0)
+        assert np.all(smoothed[edges > 0])
+        # Field interior and far exterior should not be edges
+        assert not smoothed[16, 16]
+        assert not smoothed[0, 0]
+
+    def test_numba_matches_scipy(self, monkeypatch):
+        # The fused numba stencil should agree with the scipy chain
+        pytest.importorskip('numba')
+        weights = np.array([1, 3], dtype=float)
+        field = cloudfield.stacked_field(weights / 4, (64, 128),
+                                         scales=[4, 5],
+                                         rng=np.random.default_rng(42))
+        mask = cloudfield._clip_field(field, clear_frac=0.5)
+        edges_fast, smooth_fast = cloudfield._find_edges(mask, 3)
+        monkeypatch.setattr(cloudfield, '_HAS_NUMBA', False)
+        edges_slow, smooth_slow = cloudfield._find_edges(mask, 3)
+        npt.assert_array_equal(edges_fast, edges_slow)
+        npt.assert_array_equal(smooth_fast, smooth_slow)
+
+
+class TestShiftMeanLave:
+    @pytest.fixture
+    def clear_unity_field(self, random_field):
+        field = random_field.copy()
+        mask = cloudfield._clip_field(field, clear_frac=0.4)
+        field[mask > 0] = 1
+        return field
+
+    def test_mean(self, clear_unity_field):
+        ktmean = 0.7
+        out = cloudfield.shift_mean_lave(clear_unity_field, ktmean,
+                                         plot=False)
+        assert np.mean(out) == approx(ktmean, abs=0.05)
+
+    def test_range(self, clear_unity_field):
+        out = cloudfield.shift_mean_lave(clear_unity_field, 0.7, plot=False)
+        assert np.min(out) >= 0
+        assert np.max(out) <= 1
+
+
+class TestLaveScalingExact:
+    @pytest.fixture
+    def kt_field(self, random_field):
+        clear_mask = cloudfield._clip_field(random_field, clear_frac=0.5)
+        _, edge_mask = cloudfield._find_edges(clear_mask, 3)
+        return cloudfield.lave_scaling_exact(random_field, clear_mask,
+                                             edge_mask, ktmean=0.7,
+                                             ktmax=1.4, kt1pct=0.2,
+                                             plot=False), clear_mask
+
+    def test_clear_is_unity(self, kt_field):
+        kt, clear_mask = kt_field
+        # Clear areas not overlapped by edges remain unity
+        assert np.all(kt[clear_mask > 0] == 1)
+
+    def test_overshoot_limit(self, kt_field):
+        kt, _ = kt_field
+        assert np.max(kt) <= 1.1 + 1e-10
+
+    def test_mean(self, kt_field):
+        kt, _ = kt_field
+        assert np.mean(kt) == approx(0.7, abs=0.1)
+
+
+class TestTimeseriesSettings:
+    @pytest.fixture
+    def kt_ts(self):
+        np.random.seed(42)
+        index = pd.date_range('2023-06-01 10:00', periods=2 ** 12, freq='1s')
+        kt = np.clip(0.8 + 0.2 * np.cumsum(
+            np.random.randn(2 ** 12)) / 100, 0.2, 1.2)
+        return pd.Series(kt, index=index)
+
+    def test_wavelet_weights_sum(self, kt_ts):
+        _, weights = cloudfield._calc_wavelet_weights(kt_ts)
+        assert np.sum(weights) == approx(1)
+        assert np.all(weights >= 0)
+
+    def test_wavelet_weights_match_pvlib(self, kt_ts):
+        # The streaming cascade should reproduce the variance weights of
+        # the full pvlib wavelet decomposition
+        import pvlib.scaling
+        waves, tmscales = pvlib.scaling._compute_wavelet(kt_ts)
+        expected = np.nanmean(waves[:-1] ** 2, axis=1)
+        expected /= np.sum(expected)
+        vs, weights = cloudfield._calc_wavelet_weights(kt_ts)
+        npt.assert_allclose(vs, tmscales[:-1])
+        npt.assert_allclose(weights, expected, rtol=1e-10)
+
+    def test_get_settings(self, kt_ts):
+        ktmean, kt1pct, ktmax, frac_clear, vs, weights = \
+            cloudfield.get_settings_from_timeseries(kt_ts, plot=False)
+        assert ktmean == approx(np.mean(kt_ts))
+        assert ktmax == approx(np.max(kt_ts))
+        assert kt1pct <= ktmean <= ktmax
+        assert 0 <= frac_clear <= 1
+        assert len(vs) == len(weights)
+        assert np.sum(weights) == approx(1)